@@ -0,0 +1,320 @@
+import re
+import httpx
+import orjson
+import asyncio
+from collections import OrderedDict
+try:
+    import regex as _regex
+except ImportError:
+    _regex = re
+from config import *
+from telethon import TelegramClient, events
+
+# Регулярные выражения компилируются один раз при импорте
+# Экранирование через re.sub с шаблоном выполняется целиком в C
+_ESCAPE_RE = re.compile(PATTERN_URL)
+# Символы, без которых текст не требует ни экранирования, ни преобразования разметки
+_HAS_MARKUP = re.compile(r'[\[\]()>#+\-={}.!*@]').search
+
+# Вся разметка разбирается одним проходом: ссылка, жирный текст или никнейм.
+# Текст между ними экранируется через _escape_url_chars, без вызова на каждый спецсимвол.
+# Остальные правила Telegram (__, _, ~, ||) сохраняются как есть и отдельной обработки не требуют.
+# Опережающая проверка первого символа позволяет движку быстро пропускать обычный текст.
+# Если установлен пакет regex, используется его более быстрый движок
+_MARKDOWN_RE = _regex.compile(
+    r'(?=[\[*@])'
+    r'(?:(?P<link>\[(?P<label>[^]]+)]\((?P<url>[^)]+)\))'
+    r'|(?P<bold>\*\*(?P<bold_text>[^*\n]+(?:\*(?!\*)[^*\n]*)*)\*\*)'
+    r'|(?P<username>@\w*_\w*))'
+)
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def _escape_url_chars(text):
+    """
+    Escapes the PATTERN_URL characters with a backslash.
+
+    :param text: The text to escape
+    :return: The escaped text
+    """
+    return _ESCAPE_RE.sub(r'\\\1', text)
+
+
+def _convert_markdown(text):
+    """
+    Escapes text for MarkdownV2 and converts Telegram-style formatting in a single pass.
+
+    :param text: The text to escape and convert
+    :return: The escaped and converted text
+    """
+    parts = []
+    pos = 0
+    for m in _MARKDOWN_RE.finditer(text):
+        # Экранируем текст до текущей разметки
+        parts.append(_escape_url_chars(text[pos:m.start()]))
+        kind = m.lastgroup
+        if kind == 'username':
+            # Экранируем подчеркивания в никнеймах Telegram (@username_with_underscores)
+            parts.append(m.group().replace('_', '\\_'))
+        elif kind == 'link':
+            # Экранируем только текст внутри [], URL не экранируем
+            parts.append(f"[{_convert_markdown(m.group('label'))}]({m.group('url')})")
+        else:
+            parts.append(f"*{_convert_markdown(m.group('bold_text'))}*")
+        pos = m.end()
+    parts.append(_escape_url_chars(text[pos:]))
+    return ''.join(parts)
+
+
+class TelegramNewsBot:
+    def __init__(self, channels, limit=2):
+        self.client = TelegramClient(SESSION_NAME, API_ID, API_HASH) # type: ignore
+        self.channels = channels
+        self.limit = limit
+        self._sent_group_ids = OrderedDict()
+        self._title_cache = {}
+        self._pending_albums = {}
+        self._album_tasks = set()
+        self._http = None
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    def escape_markdown_v2(self, text):
+        """
+        Escape Markdown v2 and convert Telegram-style formatting to Markdown.
+
+        This function escapes Markdown syntax in Telegram messages, except for URLs.
+        It also converts Telegram-style formatting (e.g. **bold**, __italic__, etc.) to Markdown.
+
+        :param text: The text to escape and convert
+        :return: The escaped and converted text
+        """
+        if _HAS_MARKUP(text) is None:
+            return text
+        return _convert_markdown(text)
+
+    def format_caption(self, message, channel):
+        """
+        Formats a caption for a message based on its source and content.
+
+        The caption will include the source title and a link to the message in the source
+        channel. If the source channel has no username, the caption will only include the
+        source title.
+
+        The content of the message is escaped using Markdown v2 rules.
+
+        :param message: The message to format the caption for
+        :param channel: The source channel of the message
+        :return: The formatted caption
+        """
+        source_title = channel.lstrip('@') if channel else 'Unknown'
+        source_username = channel.lstrip('@') if channel else None
+
+        if source_username:
+            post_link = f"https://t.me/{source_username}/{getattr(message, 'id', '')}"
+            safe_title = _escape_url_chars(source_title)
+            caption = f"🔁 Переслано из [{safe_title}]({post_link})"
+        else:
+            safe_title = _escape_url_chars(source_title)
+            caption = f"🔁 Переслано из {safe_title}"
+        if message.text:
+            caption += "\n\n" + self.escape_markdown_v2(message.text)
+        return caption
+
+    async def _open_http_client(self):
+        """
+        Opens a long-lived HTTP/2 client for the n8n webhook.
+
+        The client keeps connections alive between requests, and HTTP/2 lets concurrent
+        payloads share one connection instead of opening a new one for each.
+
+        :return: None
+        """
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        self._http = httpx.AsyncClient(http2=True, limits=limits, timeout=10.0)
+
+    async def _close_http_client(self):
+        """
+        Closes the HTTP client opened by _open_http_client, if any.
+
+        :return: None
+        """
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def send_to_n8n(self, data):
+        """
+        Asynchronously sends a payload to the n8n webhook.
+
+        A list of payloads is sent as a single request in the form {"batch": [...]}.
+
+        :param data: The payload or list of payloads to send to n8n
+        :return: None
+        """
+        if isinstance(data, list):
+            data = {"batch": data}
+        async with self._semaphore:
+            await self._http.post(WEBHOOK_URL, content=orjson.dumps(data), headers=_JSON_HEADERS)
+
+    def _remember_group(self, gid):
+        """
+        Marks a group as sent, evicting the oldest ids once SENT_GROUP_IDS_LIMIT is exceeded.
+
+        :param gid: The grouped_id or id of the sent group
+        :return: None
+        """
+        self._sent_group_ids[gid] = True
+        self._sent_group_ids.move_to_end(gid)
+        if len(self._sent_group_ids) > SENT_GROUP_IDS_LIMIT:
+            self._sent_group_ids.popitem(last=False)
+
+    async def _flush_album(self, channel, gid):
+        """
+        Waits for the remaining parts of an album to arrive and sends the album to n8n.
+
+        :param channel: The source channel of the album
+        :param gid: The grouped_id of the album
+        :return: None
+        """
+        await asyncio.sleep(ALBUM_FLUSH_DELAY)
+        msgs = sorted(self._pending_albums.pop(gid), key=lambda message: message.id)
+        # Запоминаем альбом до отправки, чтобы части, пришедшие во время запроса, не создали дубль
+        self._remember_group(gid)
+        try:
+            await self.send_to_n8n(self._build_payload(channel, msgs))
+        except Exception as error:
+            print(f"❌ Не удалось отправить альбом {gid} из {channel}: {error!r}")
+
+    async def _stream_groups(self, chat, limit):
+        """
+        Streams the latest messages of a chat grouped by their grouped_id or id.
+
+        Telethon yields messages newest first and album parts are adjacent, so a group is
+        complete as soon as the key changes and can be yielded without waiting for the rest.
+        Each yielded list is sorted by message id.
+
+        :param chat: The chat to fetch messages from
+        :param limit: The number of messages to fetch
+        :return: Async generator of sorted lists of messages
+        """
+        current_key, bucket = None, []
+        async for m in self.client.iter_messages(chat, limit):
+            key = m.grouped_id or m.id
+            if bucket and key != current_key:
+                yield bucket[::-1]
+                bucket = []
+            current_key = key
+            bucket.append(m)
+        if bucket:
+            yield bucket[::-1]
+
+    def _build_payload(self, channel, msgs):
+        """
+        Builds a payload to be sent to the n8n webhook from a list of messages.
+
+        The payload includes the channel name, the concatenated text of all messages,
+        a caption that includes the source title and a link to the first message in the
+        source channel, and the message and channel IDs of the last message in the list.
+
+        :param channel: The source channel of the messages
+        :param msgs: The list of messages to build the payload from
+        :return: A dictionary with the payload to be sent to n8n
+        """
+        text = ''.join([m.text or '' for m in msgs])
+        username = channel.lstrip('@')
+        # Заголовок канала не меняется, поэтому экранируем его один раз
+        safe_title = self._title_cache.get(channel)
+        if safe_title is None:
+            safe_title = self._title_cache[channel] = _escape_url_chars(username or 'Unknown')
+        post_link = f"https://t.me/{username}/{msgs[0].id}"
+        caption = f"🔁 Переслано из [{safe_title}]({post_link})\n\n{self.escape_markdown_v2(text)}"
+        return {
+            "channel": channel,
+            "text": text,
+            "caption": caption,
+            "message_id": msgs[-1].id,
+            "from_channel_id": msgs[-1].chat_id
+        }
+
+    async def _process_channel(self, channel):
+        """
+        Fetches the latest messages from a channel and sends all of its groups to n8n in one batch.
+
+        :param channel: The source channel to fetch messages from
+        :return: None
+        """
+        payloads = [self._build_payload(channel, group) async for group in self._stream_groups(channel, self.limit)]
+        if payloads:
+            await self.send_to_n8n(payloads)
+
+    async def fetch_messages(self):
+        """
+        Fetches the latest messages from each channel, groups them by their grouped_id or id,
+        and sends the payloads of each channel to the n8n webhook in a single batch request.
+
+        The payload includes the channel name, the concatenated text of all messages,
+        a caption that includes the source title and a link to the first message in the
+        source channel, and the message and channel IDs of the last message in the list.
+
+        :return: None
+        """
+        await self.client.start()
+        await self._open_http_client()
+        try:
+            # Ждём все каналы, чтобы ошибка одного не закрыла клиент под остальными
+            results = await asyncio.gather(
+                *[self._process_channel(c) for c in self.channels], return_exceptions=True
+            )
+        finally:
+            await self._close_http_client()
+            await self.client.disconnect()
+        errors = [(c, r) for c, r in zip(self.channels, results) if isinstance(r, BaseException)]
+        for channel, error in errors:
+            print(f"❌ Не удалось отправить сообщения из {channel}: {error!r}")
+        if errors:
+            raise errors[0][1]
+        print(f"✅ Отправлены последние {self.limit} логических сообщений из каждого канала в n8n")
+
+    async def listen_for_new_messages(self):
+        """
+        Listens for new messages in the channels and sends a payload to the n8n webhook for each logical message.
+
+        The payload includes the channel name, the concatenated text of all messages,
+        a caption that includes the source title and a link to the first message in the
+        source channel, and the message and channel IDs of the last message in the list.
+
+        :return: None
+        """
+        self._sent_group_ids.clear()
+        self._pending_albums.clear()
+        @self.client.on(events.NewMessage(chats=self.channels))
+        async def handler(event):
+            msg = event.message
+            chat = event.chat
+            channel = chat.username if chat and chat.username else chat.title if chat else 'unknown'
+            gid = msg.grouped_id or msg.id
+            if gid in self._sent_group_ids:
+                return
+            if not msg.grouped_id:
+                await self.send_to_n8n(self._build_payload(channel, [msg]))
+                self._remember_group(gid)
+                return
+            # Части альбома приходят отдельными событиями: копим их и отправляем одним сообщением
+            if gid in self._pending_albums:
+                self._pending_albums[gid].append(msg)
+                return
+            self._pending_albums[gid] = [msg]
+            task = asyncio.create_task(self._flush_album(channel, gid))
+            self._album_tasks.add(task)
+            task.add_done_callback(self._album_tasks.discard)
+        await self.client.start()
+        await self._open_http_client()
+        print("👂 Слушаю новые сообщения и отправляю их в n8n...")
+        try:
+            await self.client.run_until_disconnected()
+        finally:
+            # Дожидаемся отложенных альбомов, пока HTTP-клиент ещё открыт
+            await asyncio.gather(*self._album_tasks, return_exceptions=True)
+            await self._close_http_client()
+
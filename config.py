@@ -14,4 +14,7 @@ CHANNELS = [
     "@tipichkras",
     "@Match_TV"
 ]
+MAX_CONCURRENT_REQUESTS = 32
+SENT_GROUP_IDS_LIMIT = 10_000
+ALBUM_FLUSH_DELAY = 2.0
 PATTERN_URL = r'([\[\]()>#+\-={}.!])'
\ No newline at end of file
@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+from bot import TelegramNewsBot, _escape_url_chars
+
+
+def make_bot():
+    # Без __init__, чтобы не создавать TelegramClient и файл сессии
+    bot = TelegramNewsBot.__new__(TelegramNewsBot)
+    bot._title_cache = {}
+    return bot
+
+
+def test_escape_url_chars():
+    assert _escape_url_chars('a.b') == 'a\\.b'
+
+
+def test_build_payload_escapes_channel_title():
+    msgs = [SimpleNamespace(id=5, text='Привет.', chat_id=42)]
+    payload = make_bot()._build_payload('@news.channel_ru', msgs)
+    assert payload['caption'] == (
+        '🔁 Переслано из [news\\.channel_ru](https://t.me/news.channel_ru/5)\n\nПривет\\.'
+    )
+    assert payload['message_id'] == 5
+    assert payload['from_channel_id'] == 42